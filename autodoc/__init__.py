@@ -0,0 +1,3 @@
+"""Automatically generate docstrings for undocumented functions."""
+
+__version__ = "0.1.0"
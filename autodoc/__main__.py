@@ -0,0 +1,30 @@
+"""Command line entry point: registers the codemod and hands off to libcst."""
+
+import sys
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as _Dumper, CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeDumper as _Dumper, SafeLoader as _Loader
+
+from libcst import tool
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    with open(tool.CONFIG_FILE_NAME) as f:
+        config = yaml.load(f, Loader=_Loader)
+    modules = config.setdefault("modules", [])
+    if "autodoc.codemod" not in modules:
+        modules.append("autodoc.codemod")
+        with open(tool.CONFIG_FILE_NAME, "w") as f:
+            yaml.dump(config, f, Dumper=_Dumper)
+    return tool.main(
+        "autodoc", ["codemod", "commands.AutodocWithCodexCommand", *argv]
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""Model backends used to generate docstrings."""
+
+import ast
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from types import MappingProxyType
+
+import requests
+import xxhash
+from requests.adapters import HTTPAdapter
+
+OPENAI_API_URL = "https://api.openai.com/v1/completions"
+DEFAULT_CACHE_PATH = "cache.sqlite"
+DEFAULT_ENGINE = "code-davinci-002"
+REQUEST_TIMEOUT = 60
+# Functions batched into a single completion request; one shared instruction
+# preamble transfer and one round-trip instead of one per function.
+BATCH_SIZE = 16
+
+# A single pooled session so keep-alive amortizes the TCP+TLS handshake
+# across every API call in a run.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+
+def compute_cache_key(func_signature: str, func_body: str) -> bytes:
+    """Return a 16-byte xxh3 digest of the function text, for cache lookup.
+
+    Only the signature and body vary between calls within a session, so the
+    key is derived from those two strings alone; the full request dict is
+    built only on a cache miss.
+    """
+    h = xxhash.xxh3_128()
+    h.update(func_signature.encode("utf-8"))
+    h.update(b"\0")
+    h.update(func_body.encode("utf-8"))
+    return h.digest()
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter.
+
+    Unlike a fixed sleep between calls, a bucket of ``capacity`` tokens lets a
+    burst of calls proceed at line rate before throttling to the steady
+    ``refill_per_sec`` refill rate.
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> None:
+        """Block until ``n`` tokens are available, then consume them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last) * self.refill_per_sec
+                )
+                self.last = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.refill_per_sec
+            time.sleep(wait)
+
+
+# 20 requests per minute, with bursts of up to 20 allowed at line rate.
+_BUCKET = TokenBucket(capacity=20, refill_per_sec=20 / 60)
+
+
+def make_request(url: str, headers: dict, data: dict) -> dict:
+    """POST ``data`` as JSON to ``url`` and return the decoded response."""
+    _BUCKET.acquire()
+    response = _SESSION.post(url, headers=headers, json=data, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def quick_extract_doc(source: str) -> str:
+    """Extract the docstring of the first top-level definition in ``source``.
+
+    ``source`` is always a single reassembled function, so only the module's
+    direct children are scanned; a full ``ast.walk`` would enqueue every
+    descendant node just to stop at the first hit.
+    """
+    tree = ast.parse(source)
+    for node in ast.iter_child_nodes(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return ast.get_docstring(node) or ""
+    return ""
+
+
+# Instruction preamble sent ahead of every function; joined once at import.
+_PROMPT_PREFIX = (
+    "\n".join(
+        [
+            "# Complete the function below with a high quality docstring.",
+            "# The docstring must follow PEP 257:",
+            "# - start with a one line imperative summary,",
+            "# - then a blank line,",
+            "# - then describe the arguments,",
+            "# - then describe the return value,",
+            "# - then describe the exceptions raised, if any.",
+            "# Do not change the function signature or body.",
+            "# Do not add type annotations.",
+            "# Keep lines shorter than 80 characters.",
+            "# Use triple double quotes.",
+            "",
+        ]
+    )
+    + "\n"
+)
+
+
+class Backend(ABC):
+    """Interface implemented by all docstring generators."""
+
+    @abstractmethod
+    def generate_function_doc_string(self, func_signature: str, func_body: str) -> str:
+        """Return a docstring for the function split into signature and body."""
+
+    def generate_function_doc_strings(self, functions: list[tuple[str, str]]) -> list[str]:
+        """Return docstrings for a list of ``(signature, body)`` pairs."""
+        return [self.generate_function_doc_string(sig, body) for sig, body in functions]
+
+
+class CodexBackend(Backend):
+    """Generate docstrings with the OpenAI Codex completion API.
+
+    Responses are cached in a local SQLite database so repeated runs over the
+    same codebase hit the network only for functions that actually changed.
+    Every cache miss is persisted immediately with ``INSERT OR IGNORE``, so a
+    crash never loses a response that was already paid for.
+
+    With the sampling parameters pinned to zero the completions are
+    deterministic, so responses can also be shared across machines: when
+    ``shared_cache_url`` (or ``AUTODOC_SHARED_CACHE_URL``) points at a static
+    HTTP store, local misses try ``GET {url}/{hex key}`` before calling the
+    API and publish new responses back with a ``PUT``. The shared cache is
+    best effort; any failure there falls through to the API.
+    """
+
+    # Sampling parameters shared by every request; only prompt/suffix vary.
+    _BASE_DATA = MappingProxyType(
+        {
+            "max_tokens": 256,
+            "temperature": 0.0,
+            "top_p": 0.0,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0,
+            "best_of": 1,
+        }
+    )
+
+    def __init__(
+        self,
+        engine: str = DEFAULT_ENGINE,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        shared_cache_url: str | None = None,
+    ):
+        self.engine = engine
+        if shared_cache_url is None:
+            shared_cache_url = os.environ.get("AUTODOC_SHARED_CACHE_URL", "")
+        self.shared_cache_url = shared_cache_url.rstrip("/") or None
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {os.environ['OPENAI_API_KEY']}",
+        }
+        self._cache_path = cache_path
+        self._connect()
+
+    def _connect(self) -> None:
+        """Open the cache database for this process.
+
+        The codemod calls into the backend from worker threads; the single
+        connection is shared and serialized with a lock.
+        """
+        self._db = sqlite3.connect(self._cache_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (h BLOB PRIMARY KEY, r BLOB)")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+
+    def __getstate__(self) -> dict:
+        # libcst's parallel codemod runner pickles the transformer (and with
+        # it this backend) into worker processes; the connection and its lock
+        # cannot cross that boundary, so each process reopens the database.
+        state = self.__dict__.copy()
+        del state["_db"]
+        del state["_db_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._connect()
+
+    def close(self) -> None:
+        """Close the cache database.
+
+        Responses are committed as soon as they arrive, so closing is only
+        about releasing the connection; nothing is flushed here and a process
+        that never calls it loses no data.
+        """
+        self._db.close()
+
+    def __enter__(self) -> "CodexBackend":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _cache_get(self, key: bytes):
+        """Return the cached response for ``key``, or ``None`` on a miss."""
+        with self._db_lock:
+            row = self._db.execute("SELECT r FROM cache WHERE h = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def _cache_put(self, key: bytes, response: dict) -> None:
+        """Persist ``response`` under ``key``."""
+        blob = pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO cache (h, r) VALUES (?, ?)", (key, blob)
+            )
+            self._db.commit()
+
+    def _shared_get(self, key: bytes):
+        """Fetch a response from the shared cache, or ``None``."""
+        if self.shared_cache_url is None:
+            return None
+        try:
+            response = _SESSION.get(
+                f"{self.shared_cache_url}/{key.hex()}", timeout=REQUEST_TIMEOUT
+            )
+            return response.json() if response.status_code == 200 else None
+        except (requests.RequestException, ValueError):
+            return None
+
+    def _shared_put(self, key: bytes, response: dict) -> None:
+        """Publish a response to the shared cache, best effort."""
+        if self.shared_cache_url is None:
+            return
+        try:
+            _SESSION.put(
+                f"{self.shared_cache_url}/{key.hex()}",
+                json=response,
+                timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException:
+            pass
+
+    def get_response(self, key: bytes, data: dict) -> dict:
+        """Fetch the API response for ``data`` and persist it under ``key``."""
+        result = self._shared_get(key)
+        if result is None:
+            result = make_request(OPENAI_API_URL, self.headers, data)
+            self._shared_put(key, result)
+        self._cache_put(key, result)
+        return result
+
+    def _extract_doc(self, response: dict, func_signature: str, func_body: str) -> str:
+        """Pull the docstring text out of a (possibly cached) API response."""
+        completion = response["choices"][0]["text"]
+        candidate = func_signature + '    """' + completion + '"""\n' + func_body
+        try:
+            return quick_extract_doc(candidate)
+        except SyntaxError:
+            return completion.strip()
+
+    def generate_function_doc_string(self, func_signature: str, func_body: str) -> str:
+        key = compute_cache_key(func_signature, func_body)
+        response = self._cache_get(key)
+        if response is None:
+            data = {
+                **self._BASE_DATA,
+                "model": self.engine,
+                "prompt": _PROMPT_PREFIX + func_signature + '    """',
+                "suffix": '"""\n' + func_body,
+            }
+            response = self.get_response(key, data)
+        return self._extract_doc(response, func_signature, func_body)
+
+    def generate_function_doc_strings(self, functions: list[tuple[str, str]]) -> list[str]:
+        """Generate docstrings for several functions with one batched API call.
+
+        The completions endpoint accepts a list of prompts, so the misses in
+        ``functions`` share a single round-trip. The endpoint only takes one
+        ``suffix``, so batched prompts end at the opening quotes with a stop
+        sequence instead of using insert mode; if the batched request is
+        rejected, each miss falls back to the single-prompt insert path.
+        """
+        keys = [compute_cache_key(sig, body) for sig, body in functions]
+        docs: list = [None] * len(functions)
+        misses = []
+        for i, key in enumerate(keys):
+            response = self._cache_get(key)
+            if response is None:
+                response = self._shared_get(key)
+                if response is not None:
+                    self._cache_put(key, response)
+            if response is None:
+                misses.append(i)
+            else:
+                docs[i] = self._extract_doc(response, *functions[i])
+        if misses:
+            data = {
+                **self._BASE_DATA,
+                "model": self.engine,
+                "prompt": [
+                    _PROMPT_PREFIX + functions[i][0] + '    """' for i in misses
+                ],
+                "stop": ['"""'],
+                "n": 1,
+            }
+            try:
+                response = make_request(OPENAI_API_URL, self.headers, data)
+            except requests.HTTPError:
+                for i in misses:
+                    docs[i] = self.generate_function_doc_string(*functions[i])
+            else:
+                for choice in response["choices"]:
+                    i = misses[choice["index"]]
+                    item = {"choices": [{"text": choice["text"]}]}
+                    self._cache_put(keys[i], item)
+                    self._shared_put(keys[i], item)
+                    docs[i] = self._extract_doc(item, *functions[i])
+        return docs
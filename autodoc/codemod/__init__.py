@@ -0,0 +1,5 @@
+"""Codemod commands exposed to ``libcst.tool``."""
+
+from autodoc.codemod.commands import AutodocCommand, AutodocWithCodexCommand
+
+__all__ = ["AutodocCommand", "AutodocWithCodexCommand"]
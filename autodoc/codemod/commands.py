@@ -0,0 +1,216 @@
+"""Codemod commands that add docstrings to undocumented functions."""
+
+import io
+import tokenize
+from concurrent.futures import ThreadPoolExecutor
+
+import libcst as cst
+import libcst.matchers as m
+from libcst.codemod import CodemodContext, VisitorBasedCodemodCommand
+from libcst.metadata import PositionProvider
+
+from autodoc.backends import BATCH_SIZE, Backend, CodexBackend, compute_cache_key
+
+# Docstring generation is network-latency bound, so requests for all
+# undocumented functions in a module are prefetched concurrently; the token
+# bucket in the backend still bounds the aggregate request rate.
+MAX_WORKERS = 8
+
+
+# Built once at import time: matching a function body against this pattern is
+# done for every def visited, and rebuilding the matcher tree per call costs
+# dozens of allocations each time.
+_MAYBE_MORE = m.AtLeastN(m.DoNotCare(), n=0)
+_DOC_BLOCK = [m.Expr(m.SimpleString()), _MAYBE_MORE]
+_DOC_PATTERN = m.SimpleStatementSuite(body=_DOC_BLOCK) | m.IndentedBlock(
+    body=[m.SimpleStatementLine(body=_DOC_BLOCK), _MAYBE_MORE]
+)
+
+
+def func_has_doc(node: cst.FunctionDef) -> bool:
+    """Return whether the function already starts with a docstring."""
+    return m.matches(node.body, _DOC_PATTERN)
+
+
+_SKIP_TOKENS = frozenset(
+    (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.COMMENT)
+)
+
+
+def module_fully_documented(source: str) -> bool:
+    """Return whether every ``def`` in ``source`` already opens with a string.
+
+    A cheap tokenizer scan run before the visitor pass, so files that need no
+    work skip the traversal and prompt-splitting entirely. f-strings are not
+    docstrings and any tokenization failure answers ``False``, leaving the
+    real decision to ``func_has_doc``.
+    """
+    depth = 0
+    awaiting_colon = False
+    awaiting_doc = False
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type in _SKIP_TOKENS:
+                continue
+            if awaiting_doc:
+                if tok.type != tokenize.STRING:
+                    return False
+                prefix = tok.string[: tok.string.find(tok.string[-1])]
+                if "f" in prefix.lower():
+                    return False
+                awaiting_doc = False
+            elif awaiting_colon:
+                if tok.type == tokenize.OP:
+                    if tok.string in "([{":
+                        depth += 1
+                    elif tok.string in ")]}":
+                        depth -= 1
+                    elif tok.string == ":" and depth == 0:
+                        awaiting_colon = False
+                        awaiting_doc = True
+            elif tok.type == tokenize.NAME and tok.string == "def":
+                awaiting_colon = True
+                depth = 0
+    except (tokenize.TokenError, IndentationError):
+        return False
+    return True
+
+
+class _UndocumentedCollector(cst.CSTVisitor):
+    """First pass: collect every function definition lacking a docstring."""
+
+    def __init__(self):
+        self.pending: list[cst.FunctionDef] = []
+
+    def visit_FunctionDef(self, node: cst.FunctionDef) -> None:
+        if not func_has_doc(node):
+            self.pending.append(node)
+
+
+class AutodocCommand(VisitorBasedCodemodCommand):
+    """Add a generated docstring to every function that lacks one."""
+
+    DESCRIPTION = "Add generated docstrings to undocumented functions."
+
+    METADATA_DEPENDENCIES = (PositionProvider,)
+
+    def __init__(self, context: CodemodContext, backend: Backend):
+        super().__init__(context)
+        self._backend = backend
+        self._docs: dict[int, str] = {}
+        # Docstrings generated this run, keyed by function-text hash, so
+        # identical stub bodies repeated across a codebase are fetched once.
+        self._local: dict[bytes, str] = {}
+
+    def _code_slice(self, start_line: int, start_col: int, end_line: int, end_col: int) -> str:
+        """Return the source text between two (1-based line, column) positions."""
+        lines = self._lines
+        if start_line == end_line:
+            return lines[start_line - 1][start_col:end_col]
+        parts = [lines[start_line - 1][start_col:]]
+        parts.extend(lines[start_line:end_line - 1])
+        parts.append(lines[end_line - 1][:end_col])
+        return "".join(parts)
+
+    def _split_function(self, node: cst.FunctionDef) -> tuple[str, str]:
+        """Slice ``node`` out of the original source as a (signature, body) pair.
+
+        The module source is already in hand, so the strings come from
+        PositionProvider ranges instead of running libcst codegen for every
+        function. Both only feed the model prompt; nested bodies are
+        re-indented to a plain four-space block so the candidate reassembled
+        in the backend still parses.
+        """
+        func = self.get_metadata(PositionProvider, node)
+        body = self.get_metadata(PositionProvider, node.body)
+        start = func.start
+        if node.decorators:
+            start = self.get_metadata(PositionProvider, node.decorators[0]).start
+        if isinstance(node.body, cst.SimpleStatementSuite):
+            # One-line suite: normalize ``def f(): stmt`` into a block.
+            func_signature = (
+                self._code_slice(start.line, start.column, body.start.line, body.start.column)
+                .rstrip()
+                + "\n"
+            )
+            func_body = "    " + self._code_slice(
+                body.start.line, body.start.column, func.end.line, func.end.column
+            ).strip() + "\n"
+            return func_signature, func_body
+        func_signature = self._code_slice(start.line, start.column, body.start.line, 0)
+        func_body = self._code_slice(body.start.line, 0, func.end.line, func.end.column)
+        drop = body.start.column - 4
+        if drop > 0:
+            prefix = " " * drop
+            func_body = "".join(
+                line[drop:] if line.startswith(prefix) else line
+                for line in func_body.splitlines(keepends=True)
+            )
+        if not func_body.endswith("\n"):
+            func_body += "\n"
+        return func_signature, func_body
+
+    def transform_module_impl(self, tree: cst.Module) -> cst.Module:
+        # Keyed by node id, so entries must never outlive the tree they were
+        # computed for: one command instance processes many files.
+        self._docs = {}
+        source = tree.code
+        if module_fully_documented(source):
+            return tree
+        self._lines = source.splitlines(keepends=True)
+        collector = _UndocumentedCollector()
+        tree.visit(collector)
+        if collector.pending:
+            splits = [self._split_function(n) for n in collector.pending]
+            keys = [compute_cache_key(sig, body) for sig, body in splits]
+            to_fetch: dict[bytes, tuple[str, str]] = {}
+            for key, split in zip(keys, splits):
+                if key not in self._local and key not in to_fetch:
+                    to_fetch[key] = split
+            if to_fetch:
+                pending = list(to_fetch.values())
+                batches = [
+                    pending[i : i + BATCH_SIZE]
+                    for i in range(0, len(pending), BATCH_SIZE)
+                ]
+                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                    docs = [
+                        doc
+                        for batch in executor.map(
+                            self._backend.generate_function_doc_strings, batches
+                        )
+                        for doc in batch
+                    ]
+                self._local.update(zip(to_fetch, docs))
+            self._docs = {
+                id(node): self._local[key]
+                for node, key in zip(collector.pending, keys)
+            }
+        return super().transform_module_impl(tree)
+
+    def leave_FunctionDef(
+        self, original_node: cst.FunctionDef, updated_node: cst.FunctionDef
+    ) -> cst.FunctionDef:
+        doc = self._docs.get(id(original_node))
+        if doc is None:
+            return updated_node
+        docstring_node = cst.SimpleStatementLine(
+            body=[cst.Expr(cst.SimpleString(f'"""{doc.strip()}"""'))]
+        )
+        body = updated_node.body
+        if isinstance(body, cst.SimpleStatementSuite):
+            # ``def f(): stmt`` has nowhere to put a docstring; expand the
+            # suite into an indented block first.
+            body = cst.IndentedBlock(
+                body=(docstring_node, cst.SimpleStatementLine(body=body.body))
+            )
+        else:
+            body = body.with_changes(body=(docstring_node, *body.body))
+        return updated_node.with_changes(body=body)
+
+
+class AutodocWithCodexCommand(AutodocCommand):
+    """``AutodocCommand`` wired to the Codex backend."""
+
+    def __init__(self, context: CodemodContext):
+        super().__init__(context, CodexBackend())